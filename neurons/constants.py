@@ -8,6 +8,10 @@ IA_MINER_WHITELIST = "whitelist_for_miners.json"
 WANDB_MINER_PATH = os.path.expanduser("~/.ImageAlchemy/wandb/miner")
 WANDB_VALIDATOR_PATH = os.path.expanduser("~/.ImageAlchemy/wandb/validator")
 
+### Background loop cadence, in timer ticks
+BACKGROUND_REGISTRATION_CHECK_TICKS = 1
+BACKGROUND_LIST_REFRESH_TICKS = 1
+
 ### Validator only
 N_NEURONS = 10
 VPERMIT_TAO = 1024
@@ -1,8 +1,8 @@
 import argparse
 import asyncio
-import copy
 import os
 import random
+import threading
 import time
 import traceback
 import typing
@@ -11,7 +11,6 @@ from typing import Dict
 
 import torch
 import torchvision.transforms as transforms
-import torchvision.transforms as T
 from neurons.constants import VPERMIT_TAO
 from neurons.protocol import ImageGeneration, IsAlive
 from neurons.utils import BackgroundTimer, background_loop, get_defaults
@@ -34,6 +33,17 @@ class BaseMiner(ABC):
         #### Parse the config
         self.config = self.get_config()
 
+        #### Miners never train, so disable autograd globally
+        torch.set_grad_enabled(False)
+
+        #### Prefer the fused attention kernels over the math fallback and let
+        #### cuDNN autotune conv algorithms; shapes are fixed per request type
+        if torch.cuda.is_available():
+            torch.backends.cuda.enable_flash_sdp(True)
+            torch.backends.cuda.enable_mem_efficient_sdp(True)
+            torch.backends.cuda.enable_math_sdp(False)
+            torch.backends.cudnn.benchmark = True
+
         self.wandb = None
 
         if self.config.logging.debug:
@@ -47,6 +57,25 @@ class BaseMiner(ABC):
         #### Build args
         self.t2i_args, self.i2i_args = self.get_args()
 
+        #### Resolve the inference dtype from the config
+        self.dtype = {
+            "float16": torch.float16,
+            "bfloat16": torch.bfloat16,
+            "float32": torch.float32,
+        }[self.config.miner.dtype]
+
+        #### Build the generator once and reseed it per request to avoid
+        #### re-allocating a CUDA generator on every generation; the pool is
+        #### grown on demand so batched requests can keep distinct seeds
+        self.generator = torch.Generator(device=self.config.miner.device)
+        self.generator_pool = [self.generator]
+
+        #### Pending text-to-image requests waiting to be coalesced
+        self.pending_batch = []
+
+        #### Set to stop the miner loop promptly on shutdown
+        self.stop_event = threading.Event()
+
         #### Init blacklists and whitelists
         self.hotkey_blacklist = set()
         self.coldkey_blacklist = set()
@@ -66,6 +95,12 @@ class BaseMiner(ABC):
         output_log("Establishing subtensor connection.", "g", type="debug")
         self.subtensor = bt.subtensor(config=self.config)
 
+        #### Separate connection for the stats loop's block subscription,
+        #### created lazily; the substrate websocket is not thread-safe, so
+        #### the subscription must not share self.subtensor with the
+        #### background timer's RPCs
+        self.block_subtensor = None
+
         #### Create the metagraph
         self.metagraph = self.subtensor.metagraph(netuid=self.config.netuid)
 
@@ -78,8 +113,9 @@ class BaseMiner(ABC):
         ### Defaults
         self.stats = get_defaults(self)
 
-        ### Set up transform function
+        ### Set up transform functions
         self.transform = transforms.Compose([transforms.PILToTensor()])
+        self.to_pil = transforms.ToPILImage()
 
         ### Start the wandb logging thread if both project and entity have been provided
         if all(
@@ -102,6 +138,10 @@ class BaseMiner(ABC):
         ### Init history dict
         self.request_dict = {}
 
+        ### Running total of counted requests so the stats loop doesn't
+        ### re-sum the whole history dict every tick
+        self.total_requests_counted = 0
+
     def start_axon(self):
         #### Serve the axon
         output_log(f"Serving axon on port {self.config.axon.port}.", "g", type="debug")
@@ -145,6 +185,12 @@ class BaseMiner(ABC):
         argp.add_argument("--wandb.api_key", type=str, default="")
         argp.add_argument("--miner.device", type=str, default="cuda:0")
         argp.add_argument("--miner.optimize", action="store_true")
+        argp.add_argument("--miner.compile_mode", type=str, default="reduce-overhead")
+        argp.add_argument("--miner.compile_fullgraph", action="store_true")
+        argp.add_argument("--miner.dtype", type=str, default="float16")
+        argp.add_argument("--miner.vae_fp32", action="store_true")
+        argp.add_argument("--miner.batch_window_ms", type=int, default=25)
+        argp.add_argument("--miner.max_batch", type=int, default=4)
 
         seed = random.randint(0, 100_000_000_000)
         argp.add_argument("--miner.seed", type=int, default=seed)
@@ -249,6 +295,103 @@ class BaseMiner(ABC):
         synapse.completion = "True"
         return synapse
 
+    def autocast(self):
+        """
+        Autocast context matching the configured inference dtype.
+        """
+        return torch.autocast(
+            device_type="cuda",
+            dtype=self.dtype,
+            enabled="cuda" in self.config.miner.device
+            and self.dtype != torch.float32,
+        )
+
+    def get_generators(self, seeds):
+        """
+        Reseed one pooled generator per batch slot.
+        """
+        while len(self.generator_pool) < len(seeds):
+            self.generator_pool.append(
+                torch.Generator(device=self.config.miner.device)
+            )
+        return [
+            generator.manual_seed(seed)
+            for generator, seed in zip(self.generator_pool, seeds)
+        ]
+
+    async def run_batched(self, model, local_args, seed):
+        """
+        Coalesce concurrent text-to-image requests arriving within the batch
+        window into a single UNet forward and fan the images back out.
+        """
+        entry = {
+            "args": local_args,
+            "seed": seed,
+            "future": asyncio.get_event_loop().create_future(),
+        }
+        self.pending_batch.append(entry)
+
+        ### Followers simply wait for the window leader to run their batch
+        if len(self.pending_batch) > 1:
+            return await entry["future"]
+
+        ### The first arrival leads the window: wait briefly so concurrent
+        ### requests can pile in, then drain the queue in shape-matched groups
+        try:
+            await asyncio.sleep(self.config.miner.batch_window_ms / 1000)
+            self.drain_pending_batches(model)
+        finally:
+            ### If the leader was cancelled before draining (e.g. the caller
+            ### disconnected mid-window), don't strand the queued entries:
+            ### drop our own and hand the rest to the event loop so every
+            ### follower still gets an answer
+            if entry in self.pending_batch:
+                self.pending_batch.remove(entry)
+            if self.pending_batch:
+                asyncio.get_event_loop().call_soon(
+                    self.drain_pending_batches, model
+                )
+
+        return await entry["future"]
+
+    def drain_pending_batches(self, model):
+        """
+        Run every pending entry in shape-matched groups of up to max_batch
+        and complete their futures.
+        """
+        while self.pending_batch:
+            target_size = self.pending_batch[0]["args"]["target_size"]
+            batch = [
+                e
+                for e in self.pending_batch
+                if e["args"]["target_size"] == target_size
+            ][: self.config.miner.max_batch]
+            for e in batch:
+                self.pending_batch.remove(e)
+
+            ### Build the batch inside the try as well; a bad request (e.g.
+            ### an out-of-range seed) must fail every future in the group,
+            ### not just the leader's
+            try:
+                batch_args = dict(batch[0]["args"])
+                batch_args["prompt"] = [e["args"]["prompt"][0] for e in batch]
+                batch_args["generator"] = self.get_generators(
+                    [e["seed"] for e in batch]
+                )
+                ### Match the inference-mode + autocast state the graphs were
+                ### compiled and warmed up under
+                with torch.inference_mode(), self.autocast():
+                    images = model(**batch_args).images
+                for e, image in zip(batch, images):
+                    ### A follower cancelled mid-flight leaves a done future;
+                    ### don't let it fail the rest of the batch
+                    if not e["future"].done():
+                        e["future"].set_result([image])
+            except Exception as error:
+                for e in batch:
+                    if not e["future"].done():
+                        e["future"].set_exception(error)
+
     async def generate_image(self, synapse: ImageGeneration) -> ImageGeneration:
         """
         Image generation logic shared between both text-to-image and image-to-image
@@ -259,8 +402,9 @@ class BaseMiner(ABC):
         self.stats.total_requests += 1
         start_time = time.perf_counter()
 
-        ### Set up args
-        local_args = copy.deepcopy(self.mapping[synapse.generation_type]["args"])
+        ### Set up args; a shallow copy suffices since the mapped defaults
+        ### only hold scalars and we never mutate them in place
+        local_args = dict(self.mapping[synapse.generation_type]["args"])
         local_args["prompt"] = [clean_nsfw_from_prompt(synapse.prompt)]
         local_args["target_size"] = (synapse.height, synapse.width)
 
@@ -268,7 +412,7 @@ class BaseMiner(ABC):
         model = self.mapping[synapse.generation_type]["model"]
 
         if synapse.generation_type == "image_to_image":
-            local_args["image"] = T.transforms.ToPILImage()(
+            local_args["image"] = self.to_pil(
                 bt.Tensor.deserialize(synapse.prompt_image)
             )
 
@@ -279,12 +423,21 @@ class BaseMiner(ABC):
         for attempt in range(3):
             try:
                 seed = synapse.seed if synapse.seed != -1 else self.config.miner.seed
-                local_args["generator"] = [
-                    torch.Generator(device=self.config.miner.device).manual_seed(seed)
-                ]
-                images = model(
-                    **local_args,
-                ).images
+                if (
+                    synapse.generation_type == "text_to_image"
+                    and self.config.miner.max_batch > 1
+                ):
+                    ### Coalesce concurrent requests into a single forward
+                    images = await self.run_batched(model, local_args, seed)
+                else:
+                    local_args["generator"] = [self.generator.manual_seed(seed)]
+                    ### Run the memory-bound UNet / attention matmuls in
+                    ### reduced precision when a half dtype was configured,
+                    ### inside inference mode to match the compile context
+                    with torch.inference_mode(), self.autocast():
+                        images = model(
+                            **local_args,
+                        ).images
                 synapse.images = [
                     bt.Tensor.serialize(self.transform(image)) for image in images
                 ]
@@ -400,6 +553,7 @@ class BaseMiner(ABC):
                     self.request_dict[caller_hotkey]["history"].append(now)
                     self.request_dict[caller_hotkey]["delta"].append(delta)
                     self.request_dict[caller_hotkey]["count"] += 1
+                    self.total_requests_counted += 1
 
                 else:
                     ### For the first request, initialize the dictionary
@@ -482,16 +636,54 @@ class BaseMiner(ABC):
     def priority_image_generation(self, synapse: ImageGeneration) -> float:
         return self._base_priority(synapse)
 
+    def wait_for_new_block(self):
+        """
+        Block until the chain head advances, using a websocket subscription
+        rather than a fixed-interval poll. Falls back to a timed sleep if the
+        endpoint doesn't support subscriptions.
+        """
+
+        def handler(obj, update_nr, subscription_id):
+            ### The first callback is the current head; return on the next one
+            ### to end the subscription
+            if update_nr > 0:
+                return obj["header"]["number"]
+
+        try:
+            if self.block_subtensor is None:
+                self.block_subtensor = bt.subtensor(config=self.config)
+            self.block_subtensor.substrate.subscribe_block_headers(handler)
+        except Exception as e:
+            bt.logging.debug(f"Failed to subscribe to block headers: {e}")
+            ### Rebuild the connection on the next attempt
+            self.block_subtensor = None
+            self.stop_event.wait(60)
+
     def loop(self):
+        #### Run the stats loop on its own daemon thread so the main thread
+        #### stays free for the axon and prompt interrupt handling
+        self.loop_thread = threading.Thread(target=self._loop, daemon=True)
+        self.loop_thread.start()
+
+        try:
+            while not self.stop_event.wait(10):
+                pass
+        #### If someone intentionally stops the miner, it'll safely terminate operations.
+        except KeyboardInterrupt:
+            self.stop_event.set()
+            self.axon.stop()
+            bt.logging.success("Miner killed by keyboard interrupt.")
+
+    def _loop(self):
         output_log("Starting miner loop.", "g", type="debug")
         step = 0
-        while True:
+        while not self.stop_event.is_set():
             #### Check the miner is still registered
             is_registered = self.check_still_registered()
 
             if not is_registered:
                 output_log("The miner is not currently registered.", "r")
-                time.sleep(120)
+                self.stop_event.wait(120)
 
                 ### Ensure the metagraph is synced before the next registration check
                 self.metagraph.sync(lite=True)
@@ -500,16 +692,35 @@ class BaseMiner(ABC):
             #### Output current statistics and set weights
             try:
                 if step % 5 == 0:
+                    #### Gather the per-uid metrics with a single host
+                    #### transfer instead of six separate device reads
+                    idx = self.miner_index
+                    block = self.metagraph.block.item()
+                    stake, rank, trust, consensus, incentive, emission = (
+                        torch.stack(
+                            [
+                                self.metagraph.S[idx],
+                                self.metagraph.R[idx],
+                                self.metagraph.T[idx],
+                                self.metagraph.C[idx],
+                                self.metagraph.I[idx],
+                                self.metagraph.E[idx],
+                            ]
+                        )
+                        .cpu()
+                        .tolist()
+                    )
+
                     #### Output metrics
                     log = (
                         f"Step: {step} | "
-                        f"Block: {self.metagraph.block.item()} | "
-                        f"Stake: {self.metagraph.S[self.miner_index]:.2f} | "
-                        f"Rank: {self.metagraph.R[self.miner_index]:.2f} | "
-                        f"Trust: {self.metagraph.T[self.miner_index]:.2f} | "
-                        f"Consensus: {self.metagraph.C[self.miner_index]:.2f} | "
-                        f"Incentive: {self.metagraph.I[self.miner_index]:.2f} | "
-                        f"Emission: {self.metagraph.E[self.miner_index]:.2f}"
+                        f"Block: {block} | "
+                        f"Stake: {stake:.2f} | "
+                        f"Rank: {rank:.2f} | "
+                        f"Trust: {trust:.2f} | "
+                        f"Consensus: {consensus:.2f} | "
+                        f"Incentive: {incentive:.2f} | "
+                        f"Emission: {emission:.2f}"
                     )
                     output_log(log, "g")
 
@@ -521,7 +732,7 @@ class BaseMiner(ABC):
                     ]
 
                     ### Retrieve total number of requests
-                    total_requests_counted = sum([x[1] for x in top_requestors])
+                    total_requests_counted = self.total_requests_counted
 
                     try:
                         ### Sort by count
@@ -546,13 +757,10 @@ class BaseMiner(ABC):
                         pass
 
                 step += 1
-                time.sleep(60)
 
-            #### If someone intentionally stops the miner, it'll safely terminate operations.
-            except KeyboardInterrupt:
-                self.axon.stop()
-                bt.logging.success("Miner killed by keyboard interrupt.")
-                break
+                #### Wake on the next block instead of polling on a timer
+                self.wait_for_new_block()
+
             #### In case of unforeseen errors, the miner will log the error and continue operations.
             except Exception as e:
                 bt.logging.error(traceback.format_exc())
@@ -1,5 +1,6 @@
 import torch
 from base import BaseMiner
+from PIL import Image
 from diffusers import (
     AutoPipelineForImage2Image,
     AutoPipelineForText2Image,
@@ -31,7 +32,7 @@ class StableMiner(BaseMiner):
         ### Load the text-to-image model
         self.t2i_model = AutoPipelineForText2Image.from_pretrained(
             self.config.miner.model,
-            torch_dtype=torch.float16,
+            torch_dtype=self.dtype,
             use_safetensors=True,
             variant="fp16",
         ).to(self.config.miner.device)
@@ -49,6 +50,11 @@ class StableMiner(BaseMiner):
             self.i2i_model.scheduler.config
         )
 
+        ### Keep the VAE in full precision if requested; fp16 VAE decodes can
+        ### overflow to NaN on some checkpoints
+        if self.config.miner.vae_fp32:
+            self.t2i_model.vae.to(torch.float32)
+
         self.safety_checker = StableDiffusionSafetyChecker.from_pretrained(
             "CompVis/stable-diffusion-safety-checker"
         ).to(self.config.miner.device)
@@ -60,15 +66,140 @@ class StableMiner(BaseMiner):
             "image_to_image": {"args": self.i2i_args, "model": self.i2i_model},
         }
 
+    def apply_compile(self, mode, fullgraph):
+        """
+        Install compiled wrappers for every sub-module on the generation
+        path, always starting from the saved eager modules so downgrades
+        don't stack wrappers.
+        """
+        #### Mark the batch dim dynamic when request batching is enabled
+        #### so a different batch size doesn't trigger a recompile
+        self.t2i_model.unet = torch.compile(
+            self.eager_modules["unet"],
+            mode=mode,
+            fullgraph=fullgraph,
+            dynamic=True if self.config.miner.max_batch > 1 else None,
+        )
+
+        #### Compile the remaining sub-modules on the generation path; the
+        #### VAE decoder and text encoder(s) together add a meaningful
+        #### share of per-image latency
+        self.t2i_model.vae.decode = torch.compile(
+            self.eager_modules["vae.decode"], mode=mode, fullgraph=False
+        )
+
+        for encoder_name in ["text_encoder", "text_encoder_2"]:
+            if encoder_name in self.eager_modules:
+                setattr(
+                    self.t2i_model,
+                    encoder_name,
+                    torch.compile(
+                        self.eager_modules[encoder_name], mode=mode, fullgraph=False
+                    ),
+                )
+
+        self.sync_i2i_modules()
+
+    def restore_eager_modules(self):
+        """
+        Put the uncompiled modules back on the pipelines.
+        """
+        self.t2i_model.unet = self.eager_modules["unet"]
+        self.t2i_model.vae.decode = self.eager_modules["vae.decode"]
+        for encoder_name in ["text_encoder", "text_encoder_2"]:
+            if encoder_name in self.eager_modules:
+                setattr(self.t2i_model, encoder_name, self.eager_modules[encoder_name])
+        self.sync_i2i_modules()
+
+    def sync_i2i_modules(self):
+        #### The image-to-image pipeline was built with from_pipe, so point
+        #### it at the same sub-modules rather than compiling twice
+        self.i2i_model.unet = self.t2i_model.unet
+        self.i2i_model.vae = self.t2i_model.vae
+        self.i2i_model.text_encoder = self.t2i_model.text_encoder
+        if hasattr(self.t2i_model, "text_encoder_2"):
+            self.i2i_model.text_encoder_2 = self.t2i_model.text_encoder_2
+
+    def warm_up_models(self):
+        """
+        Run each pipeline twice so the compile cost lands here instead of on
+        the first real query: the first pass triggers kernel autotuning, the
+        second stabilizes the captured graphs. Returns whether both pipelines
+        warmed up cleanly, since torch.compile is lazy and dynamo/inductor
+        errors only surface at the first invocation.
+        """
+        try:
+            ### Warm up under the same autocast state the serving path uses;
+            ### dynamo guards on it, so a mismatch would invalidate every
+            ### warmed graph on the first live request
+            with self.autocast():
+                for _ in range(2):
+                    warm_up(self.t2i_model, self.t2i_args)
+
+                i2i_args = dict(self.i2i_args)
+                i2i_args["image"] = Image.new("RGB", (1024, 1024))
+                for _ in range(2):
+                    warm_up(self.i2i_model, i2i_args)
+            return True
+        except Exception as e:
+            output_log(f">>> Failed to warm up the models: {e}", color_key="y")
+            return False
+
     def optimize_models(self):
-        if self.config.miner.optimize:
-            self.t2i_model.unet = torch.compile(
-                self.t2i_model.unet, mode="reduce-overhead", fullgraph=True
-            )
+        if not self.config.miner.optimize:
+            return
 
+        #### Switch the conv-heavy modules to NHWC before compiling; cuDNN's
+        #### channels-last kernels map much better onto tensor cores. The
+        #### image-to-image pipeline shares these modules via from_pipe.
+        for module in [self.t2i_model.unet, self.t2i_model.vae]:
+            module.to(memory_format=torch.channels_last)
+
+        #### Keep references to the eager modules so a compile that only
+        #### fails once invoked during warm-up can be rolled back
+        self.eager_modules = {
+            "unet": self.t2i_model.unet,
+            "vae.decode": self.t2i_model.vae.decode,
+        }
+        for encoder_name in ["text_encoder", "text_encoder_2"]:
+            encoder = getattr(self.t2i_model, encoder_name, None)
+            if encoder is not None:
+                self.eager_modules[encoder_name] = encoder
+
+        #### Compile and warm up inside inference mode; compiling outside
+        #### of it loses the reduce-overhead CUDA-graph benefit when the
+        #### pipelines later run under inference mode
+        with torch.inference_mode():
             #### Warm up model
             output_log(
                 ">>> Warming up model with compile... this takes roughly two minutes...",
                 color_key="y",
             )
-            warm_up(self.t2i_model, self.t2i_args)
+
+            attempts = [
+                (self.config.miner.compile_mode, self.config.miner.compile_fullgraph),
+                ("default", False),
+            ]
+            if attempts[0] == attempts[1]:
+                attempts = attempts[:1]
+
+            for mode, fullgraph in attempts:
+                try:
+                    self.apply_compile(mode, fullgraph)
+                except Exception as e:
+                    output_log(
+                        f">>> Failed to compile with mode {mode}: {e}.",
+                        color_key="y",
+                    )
+                    continue
+                if self.warm_up_models():
+                    return
+                output_log(
+                    f">>> Warm up failed with compile mode {mode}; falling back.",
+                    color_key="y",
+                )
+
+            #### Nothing compiled cleanly; serve the eager modules
+            output_log(">>> Serving the uncompiled models.", color_key="y")
+            self.restore_eager_modules()
+            self.warm_up_models()
@@ -1,8 +1,10 @@
 import _thread
 import json
+import logging
 import os
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime
 from threading import Timer
@@ -10,6 +12,8 @@ from threading import Timer
 import torch
 from google.cloud import storage
 from neurons.constants import (
+    BACKGROUND_LIST_REFRESH_TICKS,
+    BACKGROUND_REGISTRATION_CHECK_TICKS,
     IA_BUCKET_NAME,
     IA_MINER_BLACKLIST,
     IA_MINER_WHITELIST,
@@ -48,16 +52,31 @@ COLORS = {
 }
 
 
+#### Precomputed (prefix, suffix) pairs so the hot logging path doesn't
+#### rebuild the escape wrapping on every call
+COLOR_WRAP = {k: (v, COLORS["w"]) for k, v in COLORS.items()}
+
+
 #### Utility function for coloring logs
 def output_log(message: str, color_key: str = "w", type: str = "info") -> None:
-    log = bt.logging.info
     if type == "debug":
         log = bt.logging.debug
+        level = logging.DEBUG
+    else:
+        log = bt.logging.info
+        level = logging.INFO
+
+    ### Skip building the string entirely when the level is filtered out
+    logger = getattr(bt.logging, "_logger", None)
+    if logger is not None and not logger.isEnabledFor(level):
+        return
 
     if color_key == "na":
-        log(f"{message}")
-    else:
-        log(f"{COLORS[color_key]}{message}{COLORS['w']}")
+        log(message)
+        return
+
+    prefix, suffix = COLOR_WRAP[color_key]
+    log(prefix + message + suffix)
 
 
 def sh(message: str):
@@ -86,6 +105,19 @@ class BackgroundTimer(Timer):
             self.function(*self.args, **self.kwargs)
 
 
+def split_keys_by_type(keys):
+    """
+    Split a key listing into hotkey and coldkey sets in a single pass.
+    """
+    hotkeys, coldkeys = set(), set()
+    for k, v in keys.items():
+        if v["type"] == "hotkey":
+            hotkeys.add(k)
+        elif v["type"] == "coldkey":
+            coldkeys.add(k)
+    return hotkeys, coldkeys
+
+
 def background_loop(self, is_validator):
     """
     Handles terminating the miner after deregistration and updating the blacklist and whitelist.
@@ -95,12 +127,21 @@ def background_loop(self, is_validator):
     blacklist_type = IA_VALIDATOR_BLACKLIST if is_validator else IA_MINER_BLACKLIST
 
     #### Terminate the miner / validator after deregistration
-    if self.background_steps % 1 == 0 and self.background_steps > 1:
+    if (
+        self.background_steps > 1
+        and self.background_steps % BACKGROUND_REGISTRATION_CHECK_TICKS == 0
+    ):
         try:
-            if is_validator:
-                self.metagraph.sync(subtensor=self.subtensor)
-            else:
-                self.metagraph.sync()
+            ### Only pay for a full metagraph sync when the chain head has
+            ### advanced since the last tick; the block lookup is a single
+            ### lightweight RPC and the cached hotkeys stay valid otherwise
+            head = self.subtensor.get_current_block()
+            if head != getattr(self, "last_synced_block", None):
+                if is_validator:
+                    self.metagraph.sync(subtensor=self.subtensor)
+                else:
+                    self.metagraph.sync(lite=True)
+                self.last_synced_block = head
             if not self.wallet.hotkey.ss58_address in self.metagraph.hotkeys:
                 bt.logging.debug(f">>> {neuron_type} has deregistered... terminating.")
                 try:
@@ -122,73 +163,96 @@ def background_loop(self, is_validator):
             )
 
     #### Update the whitelists and blacklists
-    if self.background_steps % 1 == 0:
+    if (
+        self.background_steps == 1
+        or self.background_steps % BACKGROUND_LIST_REFRESH_TICKS == 0
+    ):
         try:
             ### Create client if needed
             if not self.storage_client:
                 self.storage_client = storage.Client.create_anonymous_client()
                 bt.logging.debug("Created anonymous storage client.")
 
+            ### Per-file cache so unchanged files cost a metadata call only
+            if not hasattr(self, "gcs_cache"):
+                self.gcs_cache = {}
+
+            ### Fetch the independent files concurrently; each one is its own
+            ### HTTPS round-trip, so this costs the slowest fetch rather than
+            ### the sum of all of them
+            sources = {
+                "blacklist": blacklist_type,
+                "whitelist": whitelist_type,
+            }
+            if is_validator:
+                sources["weights"] = IA_VALIDATOR_WEIGHT_FILES
+                sources["settings"] = IA_VALIDATOR_SETTINGS_FILE
+
+            with ThreadPoolExecutor(max_workers=len(sources)) as executor:
+                futures = {
+                    name: executor.submit(
+                        retrieve_public_file,
+                        self.storage_client,
+                        IA_BUCKET_NAME,
+                        source_name,
+                        self.gcs_cache,
+                    )
+                    for name, source_name in sources.items()
+                }
+                results = {name: future.result() for name, future in futures.items()}
+
             ### Update the blacklists
-            blacklist_for_neuron = retrieve_public_file(
-                self.storage_client, IA_BUCKET_NAME, blacklist_type
-            )
+            blacklist_for_neuron = results["blacklist"]
             if blacklist_for_neuron:
-                self.hotkey_blacklist = set(
-                    [
-                        k
-                        for k, v in blacklist_for_neuron.items()
-                        if v["type"] == "hotkey"
-                    ]
-                )
-                self.coldkey_blacklist = set(
-                    [
-                        k
-                        for k, v in blacklist_for_neuron.items()
-                        if v["type"] == "coldkey"
-                    ]
+                self.hotkey_blacklist, self.coldkey_blacklist = split_keys_by_type(
+                    blacklist_for_neuron
                 )
                 bt.logging.debug("Retrieved the latest blacklists.")
 
             ### Update the whitelists
-            whitelist_for_neuron = retrieve_public_file(
-                self.storage_client, IA_BUCKET_NAME, whitelist_type
-            )
+            whitelist_for_neuron = results["whitelist"]
             if whitelist_for_neuron:
-                self.hotkey_whitelist = set(
-                    [
-                        k
-                        for k, v in whitelist_for_neuron.items()
-                        if v["type"] == "hotkey"
-                    ]
-                )
-                self.coldkey_whitelist = set(
-                    [
-                        k
-                        for k, v in whitelist_for_neuron.items()
-                        if v["type"] == "coldkey"
-                    ]
+                self.hotkey_whitelist, self.coldkey_whitelist = split_keys_by_type(
+                    whitelist_for_neuron
                 )
                 bt.logging.debug("Retrieved the latest whitelists.")
 
             ### Validator only
             if is_validator:
                 ### Update weights
-                validator_weights = retrieve_public_file(
-                    self.storage_client, IA_BUCKET_NAME, IA_VALIDATOR_WEIGHT_FILES
-                )
-                self.reward_weights = torch.tensor(
-                    [v for k, v in validator_weights.items() if "manual" not in k],
-                    dtype=torch.float32,
-                ).to(self.device)
+                validator_weights = results["weights"]
+                weight_values = [
+                    v for k, v in validator_weights.items() if "manual" not in k
+                ]
+                if torch.device(self.device).type == "cuda":
+                    ### Stage through a reusable pinned buffer so the
+                    ### host-to-device copy runs async instead of stalling
+                    ### the stream from the timer thread; only worthwhile
+                    ### (and only a real copy) when the destination is CUDA
+                    buffer = getattr(self, "reward_weights_pinned", None)
+                    if buffer is None or buffer.numel() < len(weight_values):
+                        buffer = torch.empty(
+                            max(len(weight_values), 1),
+                            dtype=torch.float32,
+                            pin_memory=True,
+                        )
+                        self.reward_weights_pinned = buffer
+                    buffer[: len(weight_values)] = torch.tensor(
+                        weight_values, dtype=torch.float32
+                    )
+                    self.reward_weights = buffer[: len(weight_values)].to(
+                        self.device, non_blocking=True
+                    )
+                else:
+                    self.reward_weights = torch.tensor(
+                        weight_values, dtype=torch.float32
+                    ).to(self.device)
                 bt.logging.debug(
                     f"Retrieved the latest validator weights: {self.reward_weights}"
                 )
 
                 ### Update settings
-                validator_settings: dict = retrieve_public_file(
-                    self.storage_client, IA_BUCKET_NAME, IA_VALIDATOR_SETTINGS_FILE
-                )
+                validator_settings: dict = results["settings"]
 
                 self.request_frequency = validator_settings.get(
                     "request_frequency", VALIDATOR_DEFAULT_REQUEST_FREQUENCY
@@ -213,19 +277,38 @@ def background_loop(self, is_validator):
             if os.path.exists(wandb_path):
                 ### Write a condition to skip this if there are no runs to clean
                 # os.path.basename(path).split("run-")[1].split("-")[0], "%Y%m%d_%H%M%S"
-                runs = [
-                    x
-                    for x in os.listdir(wandb_path)
-                    if "run-" in x and not "latest-run" in x
-                ]
-                if len(runs) > 0:
-                    cleanup_runs_process = subprocess.Popen(
-                        [f"echo y | wandb sync --clean {wandb_path}"], shell=True
-                    )
-                    bt.logging.debug("Cleaned all synced wandb runs.")
-                    cleanup_cache_process = subprocess.Popen(
-                        ["wandb artifact cache cleanup 5GB"], shell=True
+                with os.scandir(wandb_path) as entries:
+                    has_runs = any(
+                        "run-" in entry.name and "latest-run" not in entry.name
+                        for entry in entries
                     )
+                if has_runs:
+                    ### Reap the previous sync before spawning another so slow
+                    ### cleanups can't pile up unwaited processes
+                    previous = getattr(self, "cleanup_runs_process", None)
+                    if previous is not None and previous.poll() is None:
+                        bt.logging.debug("The previous wandb sync is still running.")
+                    else:
+                        self.cleanup_runs_process = subprocess.Popen(
+                            [f"echo y | wandb sync --clean {wandb_path}"], shell=True
+                        )
+                        bt.logging.debug("Cleaned all synced wandb runs.")
+
+                    ### Trim the artifact cache in-process instead of paying
+                    ### for a fresh wandb CLI interpreter
+                    try:
+                        from wandb.sdk.artifacts.artifacts_cache import (
+                            get_artifacts_cache,
+                        )
+
+                        get_artifacts_cache().cleanup(5 * 1024**3)
+                    except Exception as e:
+                        bt.logging.debug(
+                            f"Falling back to the wandb CLI for the cache cleanup: {e}."
+                        )
+                        subprocess.Popen(
+                            ["wandb artifact cache cleanup 5GB"], shell=True
+                        ).wait()
                     bt.logging.debug("Cleaned all wandb cache data > 5GB.")
             else:
                 bt.logging.debug(f"The path {wandb_path} doesn't exist yet.")
@@ -237,16 +320,31 @@ def background_loop(self, is_validator):
     self.background_steps += 1
 
 
-def retrieve_public_file(client, bucket_name, source_name):
+def retrieve_public_file(client, bucket_name, source_name, cache=None):
     file = None
     try:
         bucket = client.bucket(bucket_name)
         blob = bucket.blob(source_name)
+
+        ### Fetch only the blob metadata and skip the download if the cached
+        ### copy is still the live generation
+        if cache is not None:
+            blob.reload()
+            cached = cache.get(source_name)
+            if cached is not None and cached[1] == blob.generation:
+                bt.logging.debug(
+                    f"Using the cached copy of {source_name} from {bucket_name}"
+                )
+                return cached[0]
+
         file = blob.download_as_text()
 
         bt.logging.debug(f"Successfully downloaded {source_name} from {bucket_name}")
 
         file = json.loads(file)
+
+        if cache is not None:
+            cache[source_name] = (file, blob.generation)
     except Exception as e:
         bt.logging.error(f"An error occurred downloading from Google Cloud: {e}")
 